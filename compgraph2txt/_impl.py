@@ -1,8 +1,10 @@
-from collections import defaultdict
+from collections import deque
+from heapq import heapify, heappop, heappush
+from io import StringIO
 from itertools import zip_longest
-from typing import Dict, List, Optional, Sequence, Tuple
+from typing import Dict, List, Optional, Sequence, Set, Tuple
 
-from networkx import MultiDiGraph, NetworkXNoCycle, find_cycle, topological_sort
+from networkx import MultiDiGraph
 
 round_corners = {
     "┌": "╭",
@@ -10,6 +12,21 @@ round_corners = {
     "┘": "╯",
     "└": "╰",
 }
+_ROUND_CORNERS = str.maketrans(round_corners)
+
+# Left margin characters of an active and an inactive source, encoded such that every
+# character occupies exactly two bytes
+_MARGIN_ENCODING = "utf-16-le"
+_ACTIVE_SLOT = "│ ".encode(_MARGIN_ENCODING)
+_INACTIVE_SLOT = "  ".encode(_MARGIN_ENCODING)
+_SLOT_WIDTH = len(_ACTIVE_SLOT)
+
+# Pre-built runs of repeated characters, sliced to length instead of re-multiplied
+_RUN_LENGTH = 1024
+_DASHES = "─" * _RUN_LENGTH
+_SPACES = " " * _RUN_LENGTH
+_SPACE_BARS = " │" * (_RUN_LENGTH // 2)
+_BAR_SPACES = "│ " * (_RUN_LENGTH // 2)
 
 
 def compgraph2txt(graph: MultiDiGraph, rounded_corners: bool = True) -> str:
@@ -73,46 +90,75 @@ def compgraph2txt(graph: MultiDiGraph, rounded_corners: bool = True) -> str:
     Returns:
         str: Text-based visualization of the computational graph.
     """
-    _validate_graph(graph)
+    if not isinstance(graph, MultiDiGraph):
+        raise TypeError("Graph must be a MultiDiGraph.")
+
+    # Materialize the graph once rather than re-iterating NetworkX views
+    node_attrs = dict(graph.nodes(data=True))
+    edges = list(graph.edges(data=True))
+
+    # Nodes on a cycle never reach an in-degree of zero, so they are left out
+    order = _topological_sort(node_attrs, edges)
+    if len(order) != len(node_attrs):
+        raise ValueError("Graph cannot contain a cycle.")
+
+    _validate_graph(node_attrs, edges)
 
     # List containing each "source" - i.e. (node-name, output-name) - that makes up the
     # left margin. Mutated as each node is processed
     sources: List[Optional[Tuple[str, Optional[str]]]] = []
 
+    # Encoded left margin, updated alongside sources so it never has to be rebuilt
+    margin = bytearray()
+
+    # Min-heap of the indices of sources that are None
+    free_slots: List[int] = []
+
+    # One past the index of the last source that is not None
+    alive_end = 0
+
     # Inverse mapping of sources
     source_to_index: Dict[Tuple[str, Optional[str]], int] = {}
 
     # Number of subscribers of each source
-    # None if edge output is not used, 0 if external, 1+ if used internally
-    num_subscribers: Dict[str, Optional[int]] = defaultdict(lambda: None)
+    # Missing if edge output is not used, 0 if external, 1+ if used internally
+    num_subscribers: Dict[Tuple[str, Optional[str]], int] = {}
+
+    # Source of each (node-name, input-name) of the visualized nodes
+    input_sources: Dict[Tuple[str, str], Tuple[str, Optional[str]]] = {}
 
-    # Identify external sources and count degree of each edge
-    for source_node, dest_node, data in graph.edges(data=True):
+    # Identify external sources, count degree of each edge, and map inputs to sources
+    for source_node, dest_node, data in edges:
         source = (source_node, data.get("output"))
-        if "outputs" not in graph.nodes[source_node] and source not in source_to_index:
+        if "outputs" not in node_attrs[source_node] and source not in source_to_index:
             source_to_index[source] = len(sources)
             sources.append(source)
-
-        if source not in num_subscribers:
-            num_subscribers[source] = 0
-        if "inputs" in graph.nodes[dest_node]:
-            num_subscribers[source] += 1
+            margin += _ACTIVE_SLOT
+            alive_end = len(sources)
+
+        count = num_subscribers.get(source, 0)
+        if "inputs" in node_attrs[dest_node]:
+            count += 1
+            input_sources[(dest_node, data.get("input"))] = source
+        num_subscribers[source] = count
+
+    # Unpack the attributes of each visualized node, in order (skips external nodes)
+    plan = []
+    for node in order:
+        data = node_attrs[node]
+        if "inputs" in data and "outputs" in data:
+            plan.append((node, data.get("name", node), data["inputs"], data["outputs"]))
 
     # Build the visualization
-    lines = []
-    for node in topological_sort(graph):
-        data = graph.nodes[node]
-        name = data.get("name", node)
-        try:
-            inputs = data["inputs"]
-            outputs = data["outputs"]
-        except KeyError:
-            # Skip external nodes
-            continue
+    buffer = StringIO()
+    write = buffer.write
 
+    # Lines are separated by writing a newline before each one, except the first
+    separator = ""
+    for node, name, inputs, outputs in plan:
         # Figure out the width of the box
-        max_input_len = max([len(i) for i in inputs], default=-2)
-        max_output_len = max([len(o) for o in outputs], default=-2)
+        max_input_len = max(map(len, inputs), default=-2)
+        max_output_len = max(map(len, outputs), default=-2)
         text_width = max(len(name), max_input_len + max_output_len + 2)
 
         # Ensure that the node name is centered
@@ -120,25 +166,23 @@ def compgraph2txt(graph: MultiDiGraph, rounded_corners: bool = True) -> str:
             text_width += 1
 
         # Write the top half of the box
-        source_lines = _get_source_lines(sources)
-        lines.append(f"{source_lines}┌──{'─' * text_width}──┐")
-        padding = " " * ((text_width - len(name)) // 2)
-        lines.append(f"{source_lines}│  {padding}{name}{padding}  │")
-        lines.append(f"{source_lines}├──{'─' * text_width}──┤")
+        source_lines = _get_source_lines(margin)
+        dashes = _repeat(_DASHES, text_width)
+        padding = _repeat(_SPACES, (text_width - len(name)) // 2)
+        write(separator + source_lines + "┌──" + dashes + "──┐")
+        write("\n" + source_lines + "│  " + padding + name + padding + "  │")
+        write("\n" + source_lines + "├──" + dashes + "──┤")
+        separator = "\n"
 
         # Write the bottom half of the box
         internal_outputs = []
-        for input_, output in zip_longest(inputs, outputs):
-            if input_ is None:
-                input_ = ""
-            if output is None:
-                output = ""
-            gap = " " * (text_width - len(input_) - len(output))
+        for input_, output in zip_longest(inputs, outputs, fillvalue=""):
+            gap = _repeat(_SPACES, text_width - len(input_) - len(output))
 
             # Build visualization for each input
             line_indent = source_lines
             if input_:
-                input_source = _get_source(node, input_, graph)
+                input_source = input_sources.get((node, input_))
                 if input_source is not None:
                     index = source_to_index[input_source]
 
@@ -148,11 +192,20 @@ def compgraph2txt(graph: MultiDiGraph, rounded_corners: bool = True) -> str:
                     if num_subscribers[input_source] == 0:
                         source_to_index.pop(input_source)
                         sources[index] = None
-                        source_lines = _get_source_lines(sources)
+                        _set_slot(margin, index, _INACTIVE_SLOT)
+                        heappush(free_slots, index)
+                        if index + 1 == alive_end:
+                            while alive_end and sources[alive_end - 1] is None:
+                                alive_end -= 1
+                        source_lines = _get_source_lines(margin)
                         char = "└"
                     else:
                         char = "├"
-                    line_indent = f"{source_lines[:index * 2]}{char}{'─' * (len(source_lines) - index * 2 - 1)}"
+                    line_indent = (
+                        source_lines[: index * 2]
+                        + char
+                        + _repeat(_DASHES, len(source_lines) - index * 2 - 1)
+                    )
                     input_ = f"┼→ {input_}"
                 else:
                     input_ = f"│─ {input_}"
@@ -165,103 +218,103 @@ def compgraph2txt(graph: MultiDiGraph, rounded_corners: bool = True) -> str:
                 output_source = (node, output)
                 # Output is either:
                 # (1) unused
-                if num_subscribers[output_source] is None:
-                    spacing = " │" * len(internal_outputs)
+                if output_source not in num_subscribers:
+                    spacing = _repeat(_SPACE_BARS, len(internal_outputs) * 2)
                     output = f"{output} ─│{spacing}"
                 # (2) going to 1+ external node(s) but no internal nodes
                 elif num_subscribers[output_source] == 0:
-                    spacing = "─" * (len(internal_outputs) * 2)
+                    spacing = _repeat(_DASHES, len(internal_outputs) * 2)
                     output = f"{output} ─┼{spacing}→"
                 # (3) going to 1+ internal nodes
                 else:
-                    spacing = "─" * (len(internal_outputs) * 2 + 1)
+                    spacing = _repeat(_DASHES, len(internal_outputs) * 2 + 1)
                     internal_outputs.append(output)
                     output = f"{output} ─┼{spacing}┐"
             else:
                 # Handle case where there are more inputs than outputs
-                spacing = " │" * len(internal_outputs)
+                spacing = _repeat(_SPACE_BARS, len(internal_outputs) * 2)
                 output = f"{output}  │{spacing}"
 
-            lines.append(f"{line_indent}{input_}{gap}{output}")
+            write("\n" + line_indent + input_ + gap + output)
 
-        # Finish the box
-        spacing = "│ " * len(internal_outputs)
-        source_lines = _get_source_lines(sources)
-        lines.append(f"{source_lines}└──{'─' * text_width}──┘ {spacing}")
+        # Finish the box (source_lines is kept current as inputs free up the margin)
+        spacing = _repeat(_BAR_SPACES, len(internal_outputs) * 2)
+        write("\n" + source_lines + "└──" + dashes + "──┘ " + spacing)
 
         # Write lines that move the node output into the left margin
-        left_margin = len(source_lines)
-        for i, output in enumerate(internal_outputs):
-            output_source = (node, output)
-
-            try:
-                index = sources.index(None)
-            except ValueError:
-                index = len(sources)
-                sources.append(output_source)
-                source_to_index[output_source] = index
-            else:
-                sources[index] = output_source
+        if internal_outputs:
+            left_margin = len(source_lines)
+            for i, output in enumerate(internal_outputs):
+                output_source = (node, output)
+
+                if free_slots:
+                    index = heappop(free_slots)
+                    sources[index] = output_source
+                    _set_slot(margin, index, _ACTIVE_SLOT)
+                else:
+                    index = len(sources)
+                    sources.append(output_source)
+                    margin += _ACTIVE_SLOT
                 source_to_index[output_source] = index
+                alive_end = max(alive_end, index + 1)
 
-            source_lines = _get_source_lines(sources)
+                source_lines = _get_source_lines(margin)
 
-            line_indent = f"{source_lines[:index * 2]}┌{'─' * (left_margin + text_width + 6 - len(source_lines[:index * 2]) + i * 2)}"
-            suffix = " │" * (len(internal_outputs) - i - 1)
-            lines.append(f"{line_indent}┘{suffix}")
+                line_indent = source_lines[: index * 2]
+                line_indent += "┌" + _repeat(
+                    _DASHES, left_margin + text_width + 6 - len(line_indent) + i * 2
+                )
+                suffix = _repeat(_SPACE_BARS, (len(internal_outputs) - i - 1) * 2)
+                write("\n" + line_indent + "┘" + suffix)
 
         # The left margin can sometimes get clogged with Nones
         # Basically applies "rstrip" to the left margin
-        while sources and sources[-1] is None:
-            sources.pop()
+        if alive_end < len(sources):
+            del sources[alive_end:]
+            del margin[alive_end * _SLOT_WIDTH :]
+            free_slots = [i for i in free_slots if i < alive_end]
+            heapify(free_slots)
 
-    output = "\n".join(lines)
+    output = buffer.getvalue()
 
     # Swap hard corners with round corners (if requested)
     if rounded_corners:
-        output = "".join([round_corners.get(c, c) for c in output])
+        output = output.translate(_ROUND_CORNERS)
 
     return output
 
 
-def _validate_graph(graph: MultiDiGraph):
-    if not isinstance(graph, MultiDiGraph):
-        raise TypeError("Graph must be a MultiDiGraph.")
-    try:
-        find_cycle(graph)
-    except NetworkXNoCycle:
-        pass
-    else:
-        raise ValueError("Graph cannot contain a cycle.")
-
+def _validate_graph(node_attrs: Dict[str, dict], edges: List[Tuple[str, str, dict]]):
     external_nodes = set()
     internal_nodes = set()
-    for node, data in graph.nodes(data=True):
+
+    # Inputs and outputs of each internal node, for constant-time edge checks
+    input_sets: Dict[str, Set[str]] = {}
+    output_sets: Dict[str, Set[str]] = {}
+    for node, data in node_attrs.items():
         if "inputs" in data and "outputs" in data:
             internal_nodes.add(node)
         else:
             external_nodes.add(node)
             continue
 
-        inputs = set()
-        for input_ in data["inputs"]:
-            # Assert no duplicate inputs
-            if input_ in inputs:
-                raise ValueError(
-                    f"Node '{node}' contains two instances of the same input "
-                    f"'{input_}'."
-                )
-            inputs.add(input_)
-
-        outputs = set()
-        for output in data["outputs"]:
-            # Assert no duplicate outputs
-            if output in outputs:
-                raise ValueError(
-                    f"Node '{node}' contains two instances of the same output "
-                    f"'{output}'."
-                )
-            outputs.add(output)
+        # Assert no duplicate inputs
+        inputs = data["inputs"]
+        input_sets[node] = set(inputs)
+        if len(input_sets[node]) != len(inputs):
+            raise ValueError(
+                f"Node '{node}' contains two instances of the same input "
+                f"'{_find_duplicate(inputs)}'."
+            )
+
+        # Assert no duplicate outputs
+        outputs = data["outputs"]
+        output_sets[node] = set(outputs)
+        if len(output_sets[node]) != len(outputs):
+            raise ValueError(
+                f"Node '{node}' contains two instances of the same output "
+                f"'{_find_duplicate(outputs)}'."
+            )
 
     if not internal_nodes:
         raise ValueError(
@@ -271,7 +324,7 @@ def _validate_graph(graph: MultiDiGraph):
         )
 
     dest_to_source = {}
-    for source_node, dest_node, data in graph.edges(data=True):
+    for source_node, dest_node, data in edges:
         if source_node in internal_nodes:
             if "output" not in data:
                 raise ValueError(
@@ -279,7 +332,7 @@ def _validate_graph(graph: MultiDiGraph):
                     f"attribute, which specifies the output of '{dest_node}' from "
                     "which the edge originates."
                 )
-            elif data["output"] not in graph.nodes[source_node]["outputs"]:
+            elif data["output"] not in output_sets[source_node]:
                 raise ValueError(
                     f"Edge from '{source_node}' to '{dest_node}' references output "
                     f"'{data['output']}' of '{source_node}', which does not exist."
@@ -292,7 +345,7 @@ def _validate_graph(graph: MultiDiGraph):
                     f"attribute, which specifies the input of '{source_node}' to "
                     "which the edge ends."
                 )
-            elif data["input"] not in graph.nodes[dest_node]["inputs"]:
+            elif data["input"] not in input_sets[dest_node]:
                 raise ValueError(
                     f"Edge from '{source_node}' to '{dest_node}' references input "
                     f"'{data['input']}' of '{dest_node}', which does not exist."
@@ -316,13 +369,48 @@ def _validate_graph(graph: MultiDiGraph):
             dest_to_source[dest] = source
 
 
-def _get_source_lines(sources: Sequence[Optional[Tuple[str, Optional[str]]]]):
-    return "".join(["  " if s is None else "│ " for s in sources])
+def _find_duplicate(items: Sequence[str]) -> Optional[str]:
+    seen = set()
+    for item in items:
+        if item in seen:
+            return item
+        seen.add(item)
+
+
+def _topological_sort(
+    node_attrs: Dict[str, dict], edges: List[Tuple[str, str, dict]]
+) -> List[str]:
+    # Kahn's algorithm. Parallel edges are counted individually, so a node becomes
+    # ready once the last of its incoming edges has been visited
+    in_degree = {node: 0 for node in node_attrs}
+    successors: Dict[str, List[str]] = {node: [] for node in node_attrs}
+    for source_node, dest_node, _ in edges:
+        in_degree[dest_node] += 1
+        successors[source_node].append(dest_node)
+
+    queue = deque(node for node, degree in in_degree.items() if degree == 0)
+    order = []
+    while queue:
+        node = queue.popleft()
+        order.append(node)
+        for successor in successors[node]:
+            in_degree[successor] -= 1
+            if in_degree[successor] == 0:
+                queue.append(successor)
+
+    return order
+
+
+def _get_source_lines(margin: bytearray) -> str:
+    return margin.decode(_MARGIN_ENCODING)
+
+
+def _set_slot(margin: bytearray, index: int, slot: bytes):
+    margin[index * _SLOT_WIDTH : (index + 1) * _SLOT_WIDTH] = slot
 
 
-def _get_source(
-    node: str, input_: str, graph: MultiDiGraph
-) -> Optional[Tuple[str, Optional[str]]]:
-    for source_node, _, data in graph.in_edges(node, data=True):
-        if data["input"] == input_:
-            return (source_node, data.get("output"))
+def _repeat(run: str, length: int) -> str:
+    # Runs repeat with a period that divides their length, so they can be extended
+    if length > len(run):
+        run *= length // len(run) + 1
+    return run[: max(length, 0)]
@@ -195,3 +195,54 @@ def test_invalid_edge():
     with pytest.raises(ValueError, match="requires the 'output' attribute"):
         compgraph2txt(graph)
     graph.remove_edge("A", "B")
+
+
+def test_wide_node():
+    # Wider than the pre-built character runs used for padding
+    name = "N" * 1100
+    graph = MultiDiGraph()
+    graph.add_node("A", name=name, inputs=["a"], outputs=["b"])
+
+    output = compgraph2txt(graph)
+    dashes = "─" * 1100
+    gap = " " * 1098
+    gt = f"""
+        ╭──{dashes}──╮
+        │  {name}  │
+        ├──{dashes}──┤
+        │─ a{gap}b ─│
+        ╰──{dashes}──╯
+    """
+    assert_correct_output(output, gt)
+    assert [len(line) for line in output.split("\n")] == [1106] * 4 + [1107]
+
+
+def test_node_order():
+    # Nodes that become ready together are drawn in insertion order (first in, first
+    # out), so B is drawn between A and its subscriber C
+    graph = MultiDiGraph()
+    graph.add_node("A", name="A", inputs=[], outputs=["a"])
+    graph.add_node("B", name="B", inputs=[], outputs=["b"])
+    graph.add_node("C", name="C", inputs=["c"], outputs=[])
+    graph.add_edge("A", "C", output="a", input="c")
+
+    output = compgraph2txt(graph)
+    gt = """
+        ╭─────╮
+        │  A  │
+        ├─────┤
+        │  a ─┼─╮
+        ╰─────╯ │
+        ╭───────╯
+        │ ╭─────╮
+        │ │  B  │
+        │ ├─────┤
+        │ │  b ─│
+        │ ╰─────╯
+        │ ╭─────╮
+        │ │  C  │
+        │ ├─────┤
+        ╰─┼→ c  │
+          ╰─────╯
+    """
+    assert_correct_output(output, gt)